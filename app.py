@@ -8,6 +8,8 @@ import pandas as pd
 import requests
 import streamlit as st
 
+from backend.live_cache import SemanticCache, entity_key
+
 # ----------------------------
 # Secrets / Environment
 # ----------------------------
@@ -18,10 +20,17 @@ if GEMINI_API_KEY:
 DB_URL = st.secrets.get("DB_URL", "")  # optional: URL to download f1.duckdb on first boot
 APP_DIR = Path(__file__).parent
 DB_PATH = APP_DIR / "f1.duckdb"
+EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # same encoder as backend/rag_local.py
+DOWNLOAD_CHUNK = 8 << 20  # bytes per write while fetching DB_URL
+DOWNLOAD_RETRIES = 3
+LIVE_CACHE_SIM = 0.95     # cosine similarity needed to reuse a previous Live answer
+LIVE_CACHE_MAX = 256      # Live answers kept in the semantic cache (LRU)
 
 # ----------------------------
 # Caching helpers
 # ----------------------------
+_UNSATISFIED_RANGE_RE = re.compile(r"bytes \*/(\d+)")  # 416 Content-Range: total size
+
 @st.cache_resource(show_spinner=False)
 def _download_db_if_needed() -> None:
     """
@@ -31,13 +40,35 @@ def _download_db_if_needed() -> None:
     if DB_PATH.exists() or not DB_URL:
         return
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with st.spinner("Downloading F1 database…"):
-        with requests.get(DB_URL, stream=True, timeout=120) as r:
-            r.raise_for_status()
-            with open(DB_PATH, "wb") as f:
-                for chunk in r.iter_content(1 << 20):
-                    if chunk:
-                        f.write(chunk)
+    part = DB_PATH.with_name(DB_PATH.name + ".part")
+    with st.spinner("Downloading F1 database…"), requests.Session() as sess:
+        for attempt in range(DOWNLOAD_RETRIES):
+            # resume a partial download instead of starting over
+            offset = part.stat().st_size if part.exists() else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with sess.get(DB_URL, stream=True, timeout=120, headers=headers) as r:
+                    if offset and r.status_code == 416:
+                        # complete only if the server's size matches; otherwise the .part is
+                        # stale (longer, or from another version of the file): start over
+                        m = _UNSATISFIED_RANGE_RE.match(r.headers.get("Content-Range", ""))
+                        if m and int(m.group(1)) == offset:
+                            break
+                        part.unlink()
+                        continue
+                    r.raise_for_status()
+                    mode = "ab" if offset and r.status_code == 206 else "wb"
+                    with open(part, mode) as f:
+                        for chunk in r.iter_content(DOWNLOAD_CHUNK):
+                            if chunk:
+                                f.write(chunk)
+                break
+            except requests.RequestException:
+                if attempt == DOWNLOAD_RETRIES - 1:
+                    raise
+        else:
+            raise RuntimeError("f1.duckdb download did not complete")
+    part.replace(DB_PATH)  # only a complete file ever lands at DB_PATH
 
 @st.cache_resource(show_spinner=False)
 def get_duckdb_connection() -> duckdb.DuckDBPyConnection:
@@ -46,6 +77,8 @@ def get_duckdb_connection() -> duckdb.DuckDBPyConnection:
         raise FileNotFoundError("f1.duckdb not found (and no DB_URL provided).")
     # read-only is safer for hosted environments
     con = duckdb.connect(str(DB_PATH), read_only=True)
+    # keep parquet/metadata objects cached across the app's repeated queries
+    con.execute("PRAGMA enable_object_cache")
     return con
 
 def _safe_query(sql: str, params: Tuple = ()) -> pd.DataFrame:
@@ -63,6 +96,16 @@ def get_gemini_client():
     from google import genai
     return genai.Client(api_key=GEMINI_API_KEY)
 
+@st.cache_resource(show_spinner=False)
+def get_embedder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMB_MODEL)
+
+@st.cache_resource(show_spinner=False)
+def _live_cache() -> SemanticCache:
+    """Process-wide semantic cache for Live answers."""
+    return SemanticCache(LIVE_CACHE_SIM, LIVE_CACHE_MAX)
+
 # ----------------------------
 # Backend flags
 # ----------------------------
@@ -89,14 +132,26 @@ LIVE_OK = live_available()
 # ----------------------------
 # SQL utilities (F1 dataset)
 # ----------------------------
-def _latest_year() -> Optional[int]:
+# Historical data doesn't change intraday, so year/champion lookups are cached for 24 h.
+# The cached functions raise LookupError on an empty result (DB missing or still
+# downloading): st.cache_data doesn't store exceptions, so the next call retries.
+@st.cache_data(show_spinner=False, ttl=86400)
+def _max_year() -> int:
     df = _safe_query("SELECT MAX(year) AS y FROM races")
-    if not df.empty and pd.notna(df.iloc[0,0]):
-        return int(df.iloc[0,0])
-    return None
+    if df.empty or pd.isna(df.iloc[0,0]):
+        raise LookupError("no races in DB")
+    return int(df.iloc[0,0])
+
+def _latest_year() -> Optional[int]:
+    try:
+        return _max_year()
+    except LookupError:
+        return None
+
+_WS_RE = re.compile(r"\s+")
 
 def _normalize_name(s: str) -> str:
-    return re.sub(r"\s+", " ", s.strip()).title()
+    return _WS_RE.sub(" ", s.strip()).title()
 
 def q_constructor_drivers(team: str, year: Optional[int]) -> pd.DataFrame:
     """
@@ -105,15 +160,11 @@ def q_constructor_drivers(team: str, year: Optional[int]) -> pd.DataFrame:
     if year is None:
         year = _latest_year()
     sql = """
-    WITH names AS (
-        SELECT driverId, (forename || ' ' || surname) AS name
-        FROM drivers
-    )
     SELECT DISTINCT n.name AS driver, c.name AS constructor, r.year
     FROM results rs
     JOIN races r ON r.raceId = rs.raceId
     JOIN constructors c ON c.constructorId = rs.constructorId
-    JOIN names n ON n.driverId = rs.driverId
+    JOIN driver_name n ON n.driverId = rs.driverId
     WHERE r.year = ? AND LOWER(c.name) = LOWER(?)
     ORDER BY driver
     """
@@ -123,57 +174,74 @@ def q_driver_wins(driver: str, year: Optional[int]) -> pd.DataFrame:
     if year is None:
         year = _latest_year()
     sql = """
-    WITH names AS (
-        SELECT driverId, (forename || ' ' || surname) AS name
-        FROM drivers
-    )
     SELECT COUNT(*) AS wins
     FROM results rs
     JOIN races r ON r.raceId = rs.raceId
-    JOIN names n ON n.driverId = rs.driverId
+    JOIN driver_name n ON n.driverId = rs.driverId
     WHERE r.year = ? AND n.name = ? AND rs.positionText = '1'
     """
     return _safe_query(sql, (year, driver))
 
-def q_driver_champion(year: int) -> pd.DataFrame:
+CHAMP_COLS = ["champion", "points", "wins"]
+
+def _by_year(df: pd.DataFrame) -> dict:
+    if df.empty:
+        raise LookupError("no champions in DB")
+    return {int(r[0]): tuple(r[1:]) for r in df.itertuples(index=False)}
+
+def _champion_row(champions, year: int) -> Optional[tuple]:
+    try:
+        return champions().get(year)
+    except LookupError:
+        return None
+
+@st.cache_data(show_spinner=False, ttl=86400)
+def _driver_champions() -> dict:
     """
-    Driver champion for given year using driver_standings at last round.
+    {year: (champion, points, wins)} from driver_standings at each season's last round.
     """
     sql = """
-    WITH names AS (
-      SELECT driverId, (forename || ' ' || surname) AS name FROM drivers
-    ),
-    last_round AS (
+    WITH last_round AS (
       SELECT year, MAX(round) AS max_round
       FROM races
-      WHERE year = ?
       GROUP BY year
     )
-    SELECT n.name AS champion, ds.points, ds.wins
+    SELECT r.year, n.name AS champion, ds.points, ds.wins
     FROM driver_standings ds
     JOIN races r ON r.raceId = ds.raceId
     JOIN last_round lr ON lr.year = r.year AND lr.max_round = r.round
-    JOIN names n ON n.driverId = ds.driverId
+    JOIN driver_name n ON n.driverId = ds.driverId
     WHERE ds.position = 1
     """
-    return _safe_query(sql, (year, ))
+    return _by_year(_safe_query(sql))
 
-def q_constructor_champion(year: int) -> pd.DataFrame:
+@st.cache_data(show_spinner=False, ttl=86400)
+def _constructor_champions() -> dict:
     sql = """
     WITH last_round AS (
       SELECT year, MAX(round) AS max_round
       FROM races
-      WHERE year = ?
       GROUP BY year
     )
-    SELECT c.name AS champion, cs.points, cs.wins
+    SELECT r.year, c.name AS champion, cs.points, cs.wins
     FROM constructor_standings cs
     JOIN races r ON r.raceId = cs.raceId
     JOIN last_round lr ON lr.year = r.year AND lr.max_round = r.round
     JOIN constructors c ON c.constructorId = cs.constructorId
     WHERE cs.position = 1
     """
-    return _safe_query(sql, (year, ))
+    return _by_year(_safe_query(sql))
+
+def q_driver_champion(year: int) -> pd.DataFrame:
+    """
+    Driver champion for given year using driver_standings at last round.
+    """
+    row = _champion_row(_driver_champions, year)
+    return pd.DataFrame([row], columns=CHAMP_COLS) if row else pd.DataFrame()
+
+def q_constructor_champion(year: int) -> pd.DataFrame:
+    row = _champion_row(_constructor_champions, year)
+    return pd.DataFrame([row], columns=CHAMP_COLS) if row else pd.DataFrame()
 
 def q_points_by_race_for_constructor(team: str, year: Optional[int]) -> pd.DataFrame:
     if year is None:
@@ -195,6 +263,11 @@ def q_points_by_race_for_constructor(team: str, year: Optional[int]) -> pd.DataF
 YEAR_RE = r"(19|20)\d{2}"
 TEAM_RE = r"(ferrari|mercedes|red bull|mclaren|aston martin|williams|alpine|sauber|haas|rb|alphatauri|toro rosso|renault)"
 
+# compiled once at import; parse_question runs on every Streamlit rerun
+_YEAR_RE = re.compile(YEAR_RE)
+_TEAM_RE = re.compile(TEAM_RE, re.I)
+_NAME_RE = re.compile(r"^[A-Za-z][a-z]+ [A-Za-z][a-z\-']+$")
+
 def parse_question(q: str):
     """
     Very light intent parsing to keep the app fast and dependency-free.
@@ -202,13 +275,13 @@ def parse_question(q: str):
     """
     text = q.strip().lower()
     year = None
-    m = re.search(YEAR_RE, text)
+    m = _YEAR_RE.search(text)
     if m:
         year = int(m.group(0))
 
     # team name
     team = None
-    m2 = re.search(TEAM_RE, text)
+    m2 = _TEAM_RE.search(text)
     if m2:
         team = m2.group(0).title()
         # normalize some historical variants
@@ -223,7 +296,7 @@ def parse_question(q: str):
     # crude: look for "Firstname Lastname"
     for i in range(len(words) - 1):
         cand = f"{words[i]} {words[i+1]}"
-        if re.match(r"^[A-Za-z][a-z]+ [A-Za-z][a-z\-']+$", cand):
+        if _NAME_RE.match(cand):
             driver = _normalize_name(cand)
             break
 
@@ -292,10 +365,9 @@ def answer_with_db(intent: str, args: dict) -> Optional[str]:
         df = q_points_by_race_for_constructor(team, year)
         if df.empty:
             return None
-        lines = [f"**{team} points by race in {year}:**"]
-        for _, r in df.iterrows():
-            lines.append(f"- Round {int(r['round'])}: {r['race']} — **{int(r['team_points'])}** pts")
-        return "\n".join(lines)
+        lines = ("- Round " + df["round"].astype(int).astype(str) + ": " + df["race"].astype(str)
+                 + " — **" + df["team_points"].astype(int).astype(str) + "** pts").tolist()
+        return "\n".join([f"**{team} points by race in {year}:**", *lines])
 
     # "auto" heuristic: try team drivers → driver champion → constructor champion
     if intent == "auto":
@@ -321,36 +393,85 @@ def answer_with_db(intent: str, args: dict) -> Optional[str]:
 
     return None
 
-def answer_with_live(q: str) -> Optional[str]:
-    """Very lightweight Live ‘summary’ using Gemini (no web search)."""
+_CAPWORD_RE = re.compile(r"\b[A-Z][a-z]+\b")  # name-like words, when driver names aren't loaded
+
+@st.cache_resource(show_spinner=False)
+def _driver_surname_re() -> re.Pattern:
+    """Any driver surname as a whole word, longest first. Raises (so nothing is cached) without a DB."""
+    df = _safe_query("SELECT DISTINCT surname FROM drivers")
+    names = sorted(set(df["surname"].dropna().astype(str)), key=len, reverse=True) if not df.empty else []
+    if not names:
+        raise LookupError("driver names unavailable")
+    return re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, names)) + r")(?!\w)", re.I)
+
+def _live_entities(q: str) -> frozenset:
+    """Years, teams and drivers in q; Live cache hits must match these exactly."""
+    try:
+        names = _driver_surname_re()
+    except LookupError:
+        names = _CAPWORD_RE
+    return entity_key(q, _YEAR_RE, _TEAM_RE, names)
+
+def answer_with_live(q: str, placeholder=None) -> Optional[str]:
+    """
+    Very lightweight Live ‘summary’ using Gemini (no web search).
+    Tokens are streamed into `placeholder` (an st.empty()) as they arrive, if given.
+    """
     if not LIVE_OK:
         return None
+    cache = _live_cache()
+    key = _live_entities(q)
+    try:
+        vec = get_embedder().encode([q], normalize_embeddings=True, show_progress_bar=False)[0]
+    except Exception:
+        vec = None
+    if vec is not None:
+        hit = cache.get(key, vec)
+        if hit is not None:
+            return hit
     try:
         client = get_gemini_client()
+        # fixed instruction prefix + question last, so Gemini's implicit prefix cache can hit
         prompt = (
             "Answer the F1-related question concisely (2–4 sentences). "
             "If the question is not F1-specific, gently steer back to F1. "
             "Question: " + q
         )
-        rsp = client.models.generate_content(
+        buf = ""
+        for chunk in client.models.generate_content_stream(
             model="gemini-2.5-flash",
             contents=prompt
-        )
-        txt = (rsp.text or "").strip()
-        return txt if txt else None
+        ):
+            buf += chunk.text or ""
+            if placeholder is not None:
+                placeholder.markdown(buf)
+        txt = buf.strip()
     except Exception:
         return None
+    if not txt:
+        return None
+    if vec is not None:
+        cache.put(q, key, vec, txt)
+    return txt
 
-def build_answer(q: str) -> str:
-    intent, args = parse_question(q)
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=512)
+def cached_db_answer(intent: str, args: tuple) -> Optional[str]:
+    """
+    answer_with_db memoized on what parse_question extracted (DuckDB skipped on repeats).
+    Keyed on the parse, not the prompt text: parsing is case-sensitive, so two spellings
+    of a prompt can mean different intents.
+    """
+    return answer_with_db(intent, dict(args))
 
+def build_answer(q: str, placeholder=None) -> str:
     # 1) Try DB precise answer
-    out = answer_with_db(intent, args)
+    intent, args = parse_question(q)
+    out = cached_db_answer(intent, tuple(sorted(args.items())))
     if out:
         return out
 
-    # 2) Try Live (generic) if enabled
-    out = answer_with_live(q)
+    # 2) Try Live (generic) if enabled; repeats are served by the semantic Live cache
+    out = answer_with_live(q, placeholder)
     if out:
         return out
 
@@ -395,8 +516,9 @@ if prompt:
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
+        placeholder = st.empty()
         with st.spinner("Thinking…"):
-            ans = build_answer(prompt)
-        st.markdown(ans)
+            ans = build_answer(prompt, placeholder)
+        placeholder.markdown(ans)
 
     st.session_state.msgs.append(("assistant", ans))
@@ -0,0 +1,101 @@
+# backend/gemini.py
+import os, time, random, asyncio
+from dotenv import load_dotenv
+load_dotenv()
+
+import httpx
+from google import genai
+from google.genai import errors, types
+
+TIMEOUT_MS = 15_000  # per HTTP request (HttpOptions.timeout is in milliseconds), so a stalled call fails
+RETRIES = 4  # attempts per call, including the first
+_RETRY_CODES = {429, 500, 502, 503, 504}  # rate limit / transient server errors
+
+# Network failures below the SDK: httpx transport errors (incl. timeouts), and aiohttp's
+# when the SDK picks it for the async client.
+_TRANSPORT_ERRORS = (httpx.TransportError, TimeoutError, ConnectionError)
+try:
+    import aiohttp
+    _TRANSPORT_ERRORS += (aiohttp.ClientError,)
+except ImportError:
+    pass
+
+# One long-lived client shared by every backend module: google-genai keeps one httpx client
+# (sync) and one async client per genai.Client, so connections are reused across SQL, Live and
+# local-RAG calls. HTTP/2 (needs `h2`, via httpx[http2]) multiplexes the concurrent
+# answer_many / ask_live_many requests over a single connection instead of opening one each.
+client = genai.Client(
+    api_key=os.getenv("GEMINI_API_KEY"),
+    http_options=types.HttpOptions(
+        timeout=TIMEOUT_MS,
+        client_args={"http2": True},
+        async_client_args={"http2": True},
+    ),
+)
+
+def _transient(e: Exception) -> bool:
+    if isinstance(e, errors.APIError):
+        return getattr(e, "code", None) in _RETRY_CODES
+    return isinstance(e, _TRANSPORT_ERRORS)
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(8, 0.5 * 2**attempt)) seconds."""
+    return random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+
+def generate(**kwargs):
+    """client.models.generate_content, retried with backoff on transient errors."""
+    for attempt in range(RETRIES):
+        try:
+            return client.models.generate_content(**kwargs)
+        except Exception as e:
+            if attempt == RETRIES - 1 or not _transient(e):
+                raise
+            time.sleep(_backoff(attempt))
+
+async def agenerate(**kwargs):
+    """generate() on the async client."""
+    for attempt in range(RETRIES):
+        try:
+            return await client.aio.models.generate_content(**kwargs)
+        except Exception as e:
+            if attempt == RETRIES - 1 or not _transient(e):
+                raise
+            await asyncio.sleep(_backoff(attempt))
+
+def stream(**kwargs):
+    """
+    client.models.generate_content_stream, retried like generate() until the first chunk
+    arrives; after that the caller already has output, so errors propagate.
+    """
+    for attempt in range(RETRIES):
+        try:
+            chunks = iter(client.models.generate_content_stream(**kwargs))
+            first = next(chunks, None)
+        except Exception as e:
+            if attempt == RETRIES - 1 or not _transient(e):
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        if first is not None:
+            yield first
+            yield from chunks
+        return
+
+async def astream(**kwargs):
+    """stream() on the async client."""
+    for attempt in range(RETRIES):
+        try:
+            chunks = (await client.aio.models.generate_content_stream(**kwargs)).__aiter__()
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+        except Exception as e:
+            if attempt == RETRIES - 1 or not _transient(e):
+                raise
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        yield first
+        async for ch in chunks:
+            yield ch
+        return
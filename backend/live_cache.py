@@ -0,0 +1,42 @@
+# backend/live_cache.py
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+def entity_key(q: str, *patterns) -> frozenset:
+    """Lowercased matches of each compiled pattern (years, teams, drivers) found in q."""
+    return frozenset(m.group(0).lower() for rx in patterns for m in rx.finditer(q))
+
+class SemanticCache:
+    """
+    LRU of answers looked up by question embedding. A hit needs the same entity key
+    AND cosine >= min_sim: MiniLM scores "who won the 2023 championship" vs "...2022..."
+    well above 0.95, so similarity alone would serve one entity's answer for another.
+    """
+
+    def __init__(self, min_sim: float, max_items: int):
+        self.min_sim = min_sim
+        self.max_items = max_items
+        self._items = OrderedDict()  # question -> (entity key, unit vector, answer)
+        self._lock = threading.Lock()
+
+    def get(self, key: frozenset, vec) -> Optional[str]:
+        with self._lock:
+            cands = [q for q, (k, _, _) in self._items.items() if k == key]
+            if not cands:
+                return None
+            sims = np.stack([self._items[q][1] for q in cands]) @ vec
+            best = int(sims.argmax())
+            if sims[best] < self.min_sim:
+                return None
+            self._items.move_to_end(cands[best])
+            return self._items[cands[best]][2]
+
+    def put(self, q: str, key: frozenset, vec, answer: str) -> None:
+        with self._lock:
+            self._items[q] = (key, vec, answer)
+            self._items.move_to_end(q)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
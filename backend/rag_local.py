@@ -1,23 +1,59 @@
 # backend/rag_local.py
-import os, glob, re, uuid
+import os, glob, re, uuid, itertools, functools, json
+from pathlib import Path
 import chromadb
+import numpy as np
+import torch
 from chromadb.utils import embedding_functions
-from sentence_transformers import SentenceTransformer
+from sentence_transformers import SentenceTransformer, CrossEncoder
 from pypdf import PdfReader
+try:
+    import pypdfium2 as pdfium  # C++ PDFium bindings; much faster text extraction than pypdf
+except ImportError:
+    pdfium = None
+try:
+    import faiss  # optional C++/SIMD vector store, used when RAG_STORE=faiss
+except ImportError:
+    faiss = None
 from bs4 import BeautifulSoup
 import html2text
 
 CHROMA_PATH = "artifacts/chroma_f1"
 COLLECTION = "f1_docs"
 EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMB_DIM = 384
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RAG_STORE = os.getenv("RAG_STORE", "chroma")  # "chroma" | "faiss"
+FAISS_PATH = "artifacts/faiss_f1"  # index.faiss + meta.json (text/source per vector)
 
 # --- Embeddings ---
-_sbert = SentenceTransformer(EMB_MODEL)
-def embed(texts):  # returns list[list[float]]
-    return _sbert.encode(texts, show_progress_bar=False).tolist()
+_device = "cuda" if torch.cuda.is_available() else "cpu"
+_sbert = SentenceTransformer(EMB_MODEL, device=_device)
+if _device == "cuda":
+    _sbert = _sbert.half()  # fp16 halves memory traffic on GPU
+
+def embed(texts, batch_size=128):  # returns list[list[float]]
+    return _sbert.encode(
+        list(texts), batch_size=batch_size, convert_to_numpy=True,
+        normalize_embeddings=True, show_progress_bar=False,
+    ).tolist()
+
+# --- Reranker (loaded on first use) ---
+@functools.lru_cache(maxsize=1)
+def _reranker():
+    return CrossEncoder(RERANK_MODEL, device=_device)
+
+def rerank(query, docs, top_n=3):
+    # scores every (query, chunk) pair in one batched forward pass
+    if not docs:
+        return docs
+    scores = _reranker().predict([(query, d["text"]) for d in docs], batch_size=len(docs), show_progress_bar=False)
+    order = np.argsort(-np.asarray(scores))[:top_n]
+    return [{**docs[i], "rerank": float(scores[i])} for i in order]
 
 # --- DB / Collection ---
-def _collection():
+@functools.lru_cache(maxsize=1)
+def _collection():  # one client/collection handle per process
     os.makedirs(CHROMA_PATH, exist_ok=True)
     client = chromadb.PersistentClient(path=CHROMA_PATH)
     try:
@@ -26,15 +62,65 @@ def _collection():
         col = client.create_collection(COLLECTION)
     return col
 
+@functools.lru_cache(maxsize=1)
+def _faiss_store():
+    if faiss is None:
+        raise RuntimeError("RAG_STORE=faiss but faiss is not installed (pip install faiss-cpu).")
+    idx_path = os.path.join(FAISS_PATH, "index.faiss")
+    if not os.path.exists(idx_path):
+        # inner product == cosine here because embed() normalizes
+        index = faiss.IndexHNSWFlat(EMB_DIM, 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+        return index, []
+    with open(os.path.join(FAISS_PATH, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    return faiss.read_index(idx_path), meta
+
+def _faiss_add(texts, sources, embs):
+    index, meta = _faiss_store()
+    index.add(np.ascontiguousarray(embs, dtype="float32"))
+    meta.extend({"text": t, "source": s} for t, s in zip(texts, sources))
+
+def _faiss_save():
+    index, meta = _faiss_store()
+    os.makedirs(FAISS_PATH, exist_ok=True)
+    faiss.write_index(index, os.path.join(FAISS_PATH, "index.faiss"))
+    with open(os.path.join(FAISS_PATH, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
 # --- Simple loaders ---
+def _pdfium_pages(path):
+    # PDFium is not thread-safe, so pages are read serially from one document
+    pdf = pdfium.PdfDocument(path)
+    try:
+        texts = []
+        for i in range(len(pdf)):
+            page = pdf[i]
+            try:
+                tp = page.get_textpage()
+                texts.append(tp.get_text_range() or "")
+                tp.close()
+            except Exception:
+                texts.append("")
+            finally:
+                page.close()
+        return texts
+    finally:
+        pdf.close()
+
 def _load_pdf(path):
-    reader = PdfReader(path)
+    texts = _pdfium_pages(path) if pdfium is not None else None
+    reader = PdfReader(path) if texts is None else None
     out = []
-    for i, pg in enumerate(reader.pages):
-        try:
-            txt = pg.extract_text() or ""
-        except Exception:
-            txt = ""
+    for i in range(len(texts) if texts is not None else len(reader.pages)):
+        txt = texts[i] if texts is not None else ""
+        if not txt.strip():
+            # fall back to pypdf for pages PDFium returned nothing for (or when it's missing)
+            try:
+                reader = reader or PdfReader(path)
+                txt = reader.pages[i].extract_text() or ""
+            except Exception:
+                txt = ""
         if txt.strip():
             out.append({"text": txt.strip(), "source": f"{os.path.basename(path)}#p{i+1}"})
     return out
@@ -48,32 +134,41 @@ def _load_html(path):
     return [{"text": text.strip(), "source": os.path.basename(path)}] if text.strip() else []
 
 def _load_txt(path):
-    text = open(path, "r", encoding="utf-8", errors="ignore").read()
+    text = Path(path).read_text(encoding="utf-8", errors="ignore")
     return [{"text": text.strip(), "source": os.path.basename(path)}] if text.strip() else []
 
+_SENT_END = re.compile(r"(?<=[\.\?\!])\s+")
+
 def _chunk(text, max_tokens=600, overlap=80):
-    # crude splitter by sentences; good enough for MVP
-    parts = re.split(r"(?<=[\.\?\!])\s+", text)
-    chunks, cur = [], ""
-    for p in parts:
-        if len(cur) + len(p) > max_tokens and cur:
-            chunks.append(cur.strip())
-            cur = p
-        else:
-            cur += (" " + p if cur else p)
-    if cur.strip():
-        chunks.append(cur.strip())
-    # add overlap
+    # crude splitter by sentences; good enough for MVP.
+    # One pass over sentence boundaries collecting (start, end) spans; the only
+    # strings built are the final chunks, sliced straight out of `text`.
+    n = len(text)
+    bounds = itertools.chain(((m.start(), m.end()) for m in _SENT_END.finditer(text)), [(n, n)])
+    spans, start, end, sent = [], 0, 0, 0
+    for stop, nxt in bounds:  # sentence = text[sent:stop]
+        if stop - start > max_tokens and end > start:
+            spans.append((start, end))
+            start = sent
+        end, sent = stop, nxt
+    if text[start:end].strip():
+        spans.append((start, end))
+    # add overlap by widening each span back into its predecessor
     out = []
-    for i, c in enumerate(chunks):
-        if i == 0: out.append(c); continue
-        prev = chunks[i-1]
-        tail = prev[-overlap:] if len(prev) > overlap else prev
-        out.append((tail + " " + c).strip())
+    for i, (s, e) in enumerate(spans):
+        if i:
+            ps, pe = spans[i-1]
+            s = max(ps, pe - overlap)
+        out.append(text[s:e].strip())
     return out
 
+INGEST_BATCH = 1000  # chunks embedded + written per store call
+
+def _batched(seq, n):
+    it = iter(seq)
+    yield from iter(lambda: list(itertools.islice(it, n)), [])
+
 def ingest_dir(dirpath="docs"):
-    col = _collection()
     files = sum([glob.glob(os.path.join(dirpath, ext)) for ext in ("*.pdf","*.txt","*.html","*.htm")], [])
     print(f"[ingest] dir={os.path.abspath(dirpath)} files={len(files)} -> {files}")
     to_add = []
@@ -91,24 +186,45 @@ def ingest_dir(dirpath="docs"):
                 to_add.append((str(uuid.uuid4()), ch, d["source"]))
     print(f"[ingest] total chunks: {len(to_add)}")
     if to_add:
-        print("[ingest] embedding… (first run downloads the model)")
-        ids, texts, metas = zip(*[(i,t,{"source":s}) for i,t,s in to_add])
-        embs = embed(list(texts))
-        print("[ingest] writing to chroma…")
-        col.add(ids=list(ids), documents=list(texts), metadatas=list(metas), embeddings=embs)
+        print(f"[ingest] embedding + writing to {RAG_STORE}… (first run downloads the model)")
+        # embed and write in bounded batches so peak memory doesn't scale with the corpus
+        for batch in _batched(to_add, INGEST_BATCH):
+            ids, texts, sources = (list(x) for x in zip(*batch))
+            embs = embed(texts)
+            if RAG_STORE == "faiss":
+                _faiss_add(texts, sources, embs)
+            else:
+                _collection().add(ids=ids, documents=texts, metadatas=[{"source": s} for s in sources], embeddings=embs)
+        if RAG_STORE == "faiss":
+            _faiss_save()
     print("[ingest] done")
     return len(to_add)
 
 
+def _docs(res, j):
+    return [{
+        "text": res["documents"][j][i],
+        "source": res["metadatas"][j][i]["source"],
+        "score": float(res["distances"][j][i])
+    } for i in range(len(res["ids"][j]))]
+
+def _search(embs, k):
+    if RAG_STORE == "faiss":
+        index, meta = _faiss_store()
+        index.hnsw.efSearch = max(64, k)
+        sims, ids = index.search(np.asarray(embs, dtype="float32"), k)
+        # report squared L2 like Chroma does (unit vectors: |a-b|^2 = 2 - 2*a.b)
+        return [[{**meta[i], "score": float(2 - 2 * d)} for d, i in zip(row_d, row_i) if i >= 0]
+                for row_d, row_i in zip(sims, ids)]
+    res = _collection().query(query_embeddings=embs, n_results=k, include=["documents","metadatas","distances"])
+    return [_docs(res, j) for j in range(len(embs))]
+
 def retrieve(query, k=6):
-    col = _collection()
-    embs = embed([query])[0]
-    res = col.query(query_embeddings=[embs], n_results=k, include=["documents","metadatas","distances"])
-    docs = []
-    for i in range(len(res["ids"][0])):
-        docs.append({
-            "text": res["documents"][0][i],
-            "source": res["metadatas"][0][i]["source"],
-            "score": float(res["distances"][0][i])
-        })
-    return docs
+    return _search(embed([query], batch_size=1), k)[0]
+
+def retrieve_batch(queries, k=6):
+    # one encode + one index query for all questions; returns a list of docs per query
+    queries = list(queries)
+    if not queries:
+        return []
+    return _search(embed(queries), k)
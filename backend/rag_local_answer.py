@@ -1,22 +1,28 @@
-import os, textwrap
+import textwrap
 from dotenv import load_dotenv
 load_dotenv()
 
-from google import genai
 from google.genai import types
-from backend.rag_local import retrieve
-
-_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+from backend.gemini import generate
+from backend.rag_local import retrieve, retrieve_batch, rerank
 
 SYS = """You answer strictly using the provided context. 
 If the answer is not in the context, say you don't have enough information."""
 
-def answer_local(question: str, k: int = 6) -> dict:
-    ctx = retrieve(question, k=k)
+CANDIDATES = 20  # chunks fetched from the vector store before cross-encoder rerank
+
+def answer_local(question, k: int = 3):
+    """Answer one question (-> dict) or a list of questions (-> list[dict], retrieved in one batch)."""
+    if isinstance(question, (list, tuple)):
+        return [_answer(q, ctx, k) for q, ctx in zip(question, retrieve_batch(question, k=max(CANDIDATES, k)))]
+    return _answer(question, retrieve(question, k=max(CANDIDATES, k)), k)
+
+def _answer(question: str, ctx: list, k: int) -> dict:
+    ctx = rerank(question, ctx, top_n=k)
     context_text = "\n\n".join([f"[{i+1}] Source: {c['source']}\n{c['text']}" for i, c in enumerate(ctx)])
     prompt = f"{SYS}\n\nContext:\n{context_text}\n\nUser question: {question}\nAnswer with inline [#] citations."
 
-    resp = _client.models.generate_content(
+    resp = generate(
         model="gemini-2.5-flash",
         contents=prompt,
         config=types.GenerateContentConfig()
@@ -1,28 +1,87 @@
 # backend/rag_web.py
-import os
+import asyncio
+import re
 from dotenv import load_dotenv
 load_dotenv()
 
-from google import genai
 from google.genai import types
+from backend.gemini import generate, agenerate, stream, astream
 
-_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+_MD_LINK = re.compile(r"\[([^\]]+)\]\((https?://[^\)]+)\)")
 
 def ask_live(question: str) -> dict:
     """
     Live RAG using Google Search grounding.
     Returns: {"text": str, "citations": [{"title":..., "url":...}, ...]}
     """
-    tool = types.Tool(google_search=types.GoogleSearch())
-    cfg = types.GenerateContentConfig(tools=[tool])
+    resp = generate(
+        model="gemini-2.5-flash",
+        contents=question,
+        config=_config(),
+    )
+    return _parse(resp)
 
-    resp = _client.models.generate_content(
+async def ask_live_async(question: str) -> dict:
+    """ask_live on the SDK's native async client."""
+    resp = await agenerate(
         model="gemini-2.5-flash",
         contents=question,
-        config=cfg,
+        config=_config(),
     )
+    return _parse(resp)
+
+def ask_live_stream(question: str):
+    """
+    ask_live as a stream of events, for showing the answer while it is generated:
+    {"type": "delta", "text": str} per chunk, then one
+    {"type": "done", "text": str, "citations": [...]} parsed from the full text and the
+    grounding metadata (which arrives with the final chunk). Transient failures before
+    the first chunk are retried (backend.gemini.stream); every read has the client timeout.
+    """
+    parts, last = [], None
+    for ch in stream(
+        model="gemini-2.5-flash",
+        contents=question,
+        config=_config(),
+    ):
+        last = ch
+        if ch.text:
+            parts.append(ch.text)
+            yield {"type": "delta", "text": ch.text}
+    yield {"type": "done", **_parse(last, "".join(parts))}
+
+async def ask_live_stream_async(question: str):
+    """ask_live_stream on the SDK's native async client."""
+    parts, last = [], None
+    async for ch in astream(
+        model="gemini-2.5-flash",
+        contents=question,
+        config=_config(),
+    ):
+        last = ch
+        if ch.text:
+            parts.append(ch.text)
+            yield {"type": "delta", "text": ch.text}
+    yield {"type": "done", **_parse(last, "".join(parts))}
+
+async def _ask_live_many(questions, limit):
+    sem = asyncio.Semaphore(limit)
+    async def one(q):
+        async with sem:
+            return await ask_live_async(q)
+    return await asyncio.gather(*(one(q) for q in questions))
+
+def ask_live_many(questions, limit: int = 16) -> list:
+    """ask_live for several questions concurrently, at most `limit` in flight."""
+    return asyncio.run(_ask_live_many(list(questions), limit))
+
+def _config():
+    tool = types.Tool(google_search=types.GoogleSearch())
+    return types.GenerateContentConfig(tools=[tool])
 
-    text = getattr(resp, "text", None) or "No answer."
+def _parse(resp, text: str = None) -> dict:
+    """`text` overrides resp.text (streams pass the joined chunks and the final chunk)."""
+    text = (text if text is not None else getattr(resp, "text", None)) or "No answer."
     # Try to collect citations (SDK may change; be defensive)
     citations = []
     try:
@@ -42,15 +101,11 @@ def ask_live(question: str) -> dict:
 
     # Fallback: parse markdown links from text if grounding metadata missing
     if not citations:
-        import re
-        for m in re.finditer(r"\[([^\]]+)\]\((https?://[^\)]+)\)", text):
-            citations.append({"title": m.group(1), "url": m.group(2)})
+        citations = [{"title": m.group(1), "url": m.group(2)} for m in _MD_LINK.finditer(text)]
 
-    # De-dupe citations
-    seen = set()
-    uniq = []
+    # De-dupe citations by URL (first-seen order and title)
+    seen = {}
     for c in citations:
-        if c["url"] not in seen:
-            seen.add(c["url"])
-            uniq.append(c)
-    return {"text": text, "citations": uniq[:8]}
+        seen.setdefault(c["url"], c)
+    uniq = list(seen.values())[:8]
+    return {"text": text, "citations": uniq}
@@ -1,16 +1,32 @@
 # backend/sql_agent.py
-import os, json, re, duckdb
+import os, json, re, duckdb, functools, hashlib, asyncio, time, math, threading, weakref
+from collections import Counter
 from dotenv import load_dotenv
 load_dotenv()
 
 # --- LLM client (Gemini) ---
-from google import genai
 from google.genai import types
-_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+from backend.gemini import client as _client, generate, agenerate
+MODEL = "gemini-2.5-flash"
+LLM_CONCURRENCY = 16  # max in-flight Gemini calls for answer_many
+PREFIX_CACHE_TTL = 3600  # seconds; Gemini CachedContent lifetime for the static prompt prefix
+SHOT_K = 2  # few-shots sent per question, picked by TF-IDF similarity
+
+# --- DuckDB (one read-only connection per process; a cursor per query) ---
+DB_PATH = "f1.duckdb"
+
+@functools.lru_cache(maxsize=1)
+def _con():
+    con = duckdb.connect(DB_PATH, read_only=True)
+    con.execute("PRAGMA threads=4;")
+    return con
 
 # --- load schema ---
-with open("artifacts/schema.json") as f:
-    SCHEMA = json.load(f)
+try:
+    from artifacts.schema import SCHEMA  # generated by scripts/dump_schema.py
+except ImportError:
+    with open("artifacts/schema.json") as f:
+        SCHEMA = json.load(f)
 
 # -------------------- Prompting --------------------
 SYSTEM_RULES = """You are a SQL generator for DuckDB over Formula 1 tables.
@@ -26,6 +42,8 @@ RULES
 6) Driver full name: (drivers.forename || ' ' || drivers.surname) AS name.
 7) When returning a breakdown, include useful columns (year, round, race/circuit, driver/constructor) and an ORDER BY.
 8) If the user didn’t specify a year and you need one, do NOT invent it—answer across all years (but still return an ORDER BY and LIMIT if the result could be huge).
+9) If the Tables list includes mv_* rollups, prefer them: mv_driver_year_wins / mv_driver_year_points / mv_driver_year_podiums (one row per driver name and year) and mv_constructor_race_points (one row per constructor and race). They already carry names, so no joins are needed.
+10) If the Tables list shows a drivers.name column, it already holds forename || ' ' || surname and is indexed: filter on drivers.name directly instead of concatenating, and always qualify it (races and constructors also have a name column).
 """
 
 # Few-shots (include a breakdown example)
@@ -93,6 +111,30 @@ ORDER BY r.round;"""
     }
 ]
 
+# Few-shots over the rollups built by scripts/build_facts.py (only shown when the DB has them)
+MV_SHOTS = [
+    {
+      "q": "wins for Max Verstappen in 2023 (rollup)",
+      "sql": """SELECT wins FROM mv_driver_year_wins
+WHERE name = 'Max Verstappen' AND year = 2023;"""
+    },
+    {
+      "q": "Sergio Perez podiums by season since 2020 (rollup)",
+      "sql": """SELECT year, name, podiums FROM mv_driver_year_podiums
+WHERE name = 'Sergio Pérez' AND year >= 2020
+ORDER BY year;"""
+    },
+    {
+      "q": "Ferrari points by race in 2024 (rollup)",
+      "sql": """SELECT year, round, race_name, constructor, points FROM mv_constructor_race_points
+WHERE constructor = 'Ferrari' AND year = 2024
+ORDER BY round;"""
+    },
+]
+_HAS_ROLLUPS = "mv_driver_year_wins" in SCHEMA
+if _HAS_ROLLUPS:
+    FEW_SHOTS = FEW_SHOTS + MV_SHOTS
+
 def _schema_text():
     parts = []
     for t, cols in SCHEMA.items():
@@ -100,63 +142,386 @@ def _schema_text():
         parts.append(f"- {t}({coltxt})")
     return "\n".join(parts)
 
+# Static prompt pieces and regexes, built once at import rather than per call
+_SCHEMA_TEXT = _schema_text()
+_SHOT_TEXTS = [f"Q: {s['q']}\nSQL:\n```sql\n{s['sql']}\n```" for s in FEW_SHOTS]
+_PROMPT_PREFIX = (
+  f"{SYSTEM_RULES}\n\n"
+  f"Tables:\n{_SCHEMA_TEXT}\n\n"
+)
+_RE_FENCE = re.compile(r"```sql\s*(.+?)```", re.S|re.I)
+_RE_LEAD = re.compile(r"^\s*(with|select)\b", re.I)
+_RE_TABLES = re.compile(rf"\b({'|'.join(map(re.escape, SCHEMA.keys()))})\b", re.I)
+_RE_LIMIT = re.compile(r"\blimit\b", re.I)
+_RE_AGG = re.compile(r"\b(count|sum|avg|min|max)\s*\(", re.I)
+_RE_GB = re.compile(r"\bgroup\s+by\b", re.I)
+
 # Small helper: if user hints "breakdown", we add a gentle instruction
 _BREAKDOWN_HINTS = re.compile(r"\b(by race|per round|timeline|by season|per circuit|per track|breakdown)\b", re.I)
 
+_JSON_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.I)
+
+# --- Few-shot selection: TF-IDF over the shot questions (tiny corpus, so plain dicts) ---
+_TOKEN = re.compile(r"[a-z0-9]+")
+_SHOT_DF = Counter(t for s in FEW_SHOTS for t in set(_TOKEN.findall(s["q"].lower())))
+_IDF = {t: math.log((1 + len(FEW_SHOTS)) / (1 + df)) + 1 for t, df in _SHOT_DF.items()}
+
+def _tfidf(text: str) -> dict:
+    v = {t: c * _IDF[t] for t, c in Counter(_TOKEN.findall(text.lower())).items() if t in _IDF}
+    norm = math.sqrt(sum(x * x for x in v.values())) or 1.0
+    return {t: x / norm for t, x in v.items()}
+
+_SHOT_VECS = [_tfidf(s["q"]) for s in FEW_SHOTS]
+
+def _shots_for(questions: list, k: int = SHOT_K) -> str:
+    """The k most similar few-shots per question (union, in FEW_SHOTS order) as prompt text."""
+    picked = set()
+    for q in questions:
+        qv = _tfidf(q)
+        sims = [sum(x * sv.get(t, 0.0) for t, x in qv.items()) for sv in _SHOT_VECS]
+        picked.update(sorted(range(len(sims)), key=lambda i: -sims[i])[:k])
+    return "\n\n".join(_SHOT_TEXTS[i] for i in sorted(picked)) + "\n\n"
+
 def _augment_question(q: str) -> str:
     if _BREAKDOWN_HINTS.search(q):
         return q + " — return a multi-row breakdown with clear columns and an ORDER BY."
     return q
 
+# --- Exact-match SQL cache (opt-in: SQL_CACHE=1, needs `pip install diskcache`) ---
+SQL_CACHE_PATH = "artifacts/sql_cache"
+
+@functools.lru_cache(maxsize=1)
+def _sql_cache():
+    if os.getenv("SQL_CACHE") != "1":
+        return None
+    import diskcache
+    return diskcache.Cache(SQL_CACHE_PATH)
+
+# anything that changes the prompt must change the key
+_CACHE_SALT = json.dumps([MODEL, SYSTEM_RULES, FEW_SHOTS, SCHEMA], sort_keys=True)
+
+def _cache_key(question: str) -> str:
+    return hashlib.sha256(json.dumps([_CACHE_SALT, question]).encode("utf-8")).hexdigest()
+
+def _prompt_prefix() -> str:
+    return _PROMPT_PREFIX
+
+# --- Gemini context cache for the static prefix (rules + schema; few-shots vary per question) ---
+# Refreshes are single-flight (every CachedContent is billed storage until its TTL): one
+# thread lock for sync callers, one asyncio.Lock per event loop for async ones.
+_prefix_cache = {"name": None, "until": 0.0}
+_prefix_lock = threading.Lock()
+_prefix_alocks = weakref.WeakKeyDictionary()  # event loop -> asyncio.Lock
+
+def _prefix_cache_config():
+    return types.CreateCachedContentConfig(contents=[_prompt_prefix()], ttl=f"{PREFIX_CACHE_TTL}s")
+
+def _cached_prefix():
+    """CachedContent name holding _prompt_prefix(), refreshed before expiry; None if unavailable."""
+    if time.time() < _prefix_cache["until"]:
+        return _prefix_cache["name"]
+    with _prefix_lock:
+        now = time.time()
+        if now < _prefix_cache["until"]:  # another thread refreshed it while we waited
+            return _prefix_cache["name"]
+        try:
+            name = _client.caches.create(model=MODEL, config=_prefix_cache_config()).name
+        except Exception:
+            name = None  # e.g. prefix under the model's minimum; send it inline until the next retry
+        _prefix_cache.update(name=name, until=now + PREFIX_CACHE_TTL - 60)
+        return name
+
+async def _acached_prefix():
+    """_cached_prefix() for the event loop: the refresh goes through the async client."""
+    if time.time() < _prefix_cache["until"]:
+        return _prefix_cache["name"]
+    lock = _prefix_alocks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+    async with lock:
+        now = time.time()
+        if now < _prefix_cache["until"]:  # another task refreshed it while we waited
+            return _prefix_cache["name"]
+        try:
+            name = (await _client.aio.caches.create(model=MODEL, config=_prefix_cache_config())).name
+        except Exception:
+            name = None
+        _prefix_cache.update(name=name, until=now + PREFIX_CACHE_TTL - 60)
+        return name
+
+def _request(tail: str, **cfg):
+    """(contents, config) for a prompt ending in `tail`, reusing the cached prefix when possible."""
+    return _with_prefix(_cached_prefix(), tail, **cfg)
+
+def _with_prefix(name, tail: str, **cfg):
+    if name:
+        return tail, types.GenerateContentConfig(cached_content=name, **cfg)
+    return _prompt_prefix() + tail, types.GenerateContentConfig(**cfg)
+
 def llm_to_sql(question: str) -> str:
-    shots = "\n\n".join([f"Q: {s['q']}\nSQL:\n```sql\n{s['sql']}\n```" for s in FEW_SHOTS])
-    prompt = (
-      f"{SYSTEM_RULES}\n\n"
-      f"Tables:\n{_schema_text()}\n\n"
-      f"{shots}\n\n"
-      f"Q: {_augment_question(question)}\nSQL:"
-    )
-    resp = _client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-        config=types.GenerateContentConfig()
-    )
-    text = resp.text or ""
-    m = re.search(r"```sql\s*(.+?)```", text, re.S|re.I)
+    cache = _sql_cache()
+    if cache is not None:
+        key = _cache_key(question)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+
+    contents, config = _request(f"{_shots_for([question])}Q: {_augment_question(question)}\nSQL:")
+    resp = generate(model=MODEL, contents=contents, config=config)
+    sql = _sql_from_text(resp.text or "")
+
+    if cache is not None:
+        cache.set(key, sql)  # only SQL that passed the safety checks is cached
+    return sql
+
+async def llm_to_sql_async(question: str) -> str:
+    """llm_to_sql on the SDK's async client, for running many questions on one event loop."""
+    cache = _sql_cache()
+    if cache is not None:
+        key = _cache_key(question)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+
+    contents, config = _with_prefix(await _acached_prefix(),
+                                    f"{_shots_for([question])}Q: {_augment_question(question)}\nSQL:")
+    resp = await agenerate(model=MODEL, contents=contents, config=config)
+    sql = _sql_from_text(resp.text or "")
+
+    if cache is not None:
+        cache.set(key, sql)
+    return sql
+
+def _sql_from_text(text: str) -> str:
+    m = _RE_FENCE.search(text)
     if not m:
         raise ValueError("LLM did not return SQL in a fenced block.")
-    sql = m.group(1).strip()
+    return _check_sql(m.group(1).strip())
+
+def llm_to_sql_batch(questions: list) -> list:
+    """
+    One Gemini call for several questions (amortizes the static prefix and the
+    per-request rate limit). Returns one SQL string per question, in order.
+    """
+    questions = list(questions)
+    cache = _sql_cache()
+    keys = [_cache_key(q) for q in questions] if cache is not None else [None] * len(questions)
+    out = [cache.get(k) if cache is not None else None for k in keys]
+    todo = [i for i, sql in enumerate(out) if sql is None]
+    if len(todo) == 1:
+        out[todo[0]] = llm_to_sql(questions[todo[0]])
+        todo = []
+    if todo:
+        qs = "\n".join(f"Q{n}: {_augment_question(questions[i])}" for n, i in enumerate(todo, 1))
+        contents, config = _request(
+            _shots_for([questions[i] for i in todo]) +
+            "Write one SQL query for EACH question below.\n"
+            'Reply with ONLY a JSON array, one object per question: [{"id": 1, "sql": "..."}, ...]\n\n'
+            + qs,
+            response_mime_type="application/json",
+        )
+        resp = generate(model=MODEL, contents=contents, config=config)
+        text = _JSON_FENCE.sub("", (resp.text or "").strip())
+        try:
+            by_id = {int(it["id"]): it["sql"] for it in json.loads(text)}
+        except (ValueError, TypeError, KeyError) as e:
+            raise ValueError("LLM did not return a JSON array of {id, sql}.") from e
+        for n, i in enumerate(todo, 1):
+            if n not in by_id:
+                raise ValueError(f"LLM returned no SQL for question {n}.")
+            out[i] = _check_sql(by_id[n].strip())
+            if cache is not None:
+                cache.set(keys[i], out[i])
+    return out
 
+def _check_sql(sql: str) -> str:
     # ---- Safety checks ----
-    if not re.match(r"^\s*(with|select)\b", sql, re.I):
+    if not _RE_LEAD.match(sql):
         raise ValueError("Only SELECT/WITH queries are allowed.")
     # allow trailing semicolon but not chaining
     if ";" in sql.strip()[:-1]:
         raise ValueError("Multiple statements not allowed.")
     # very light table whitelist (optional): ensure it only uses known tables/views
-    tbls = "|".join(map(re.escape, SCHEMA.keys()))
-    if not re.search(rf"\b({tbls})\b", sql, re.I):
+    if not _RE_TABLES.search(sql):
         # not fatal, but it helps avoid hallucinated tables
         pass
-
     return sql
 
+# -------------------- Structural (template) cache --------------------
+# Questions that differ only in driver/constructor/year share one template, e.g.
+# "wins for {DRIVER} in {YEAR}". The first LLM answer for a template is stored with
+# those literals turned into ? parameters; later variants skip the LLM entirely.
+_YEAR_SLOT = re.compile(r"\b(?:19|20)\d{2}\b")
+_WS = re.compile(r"\s+")
+_TEMPLATE_MAX = 1024
+_TEMPLATES = {}  # template -> (parameterized sql, slot index for each ?)
+
+@functools.lru_cache(maxsize=1)
+def _entity_res():
+    cur = _con().cursor()
+    try:
+        drivers = [r[0] for r in cur.execute("SELECT DISTINCT forename || ' ' || surname FROM drivers").fetchall()]
+        teams = [r[0] for r in cur.execute("SELECT DISTINCT name FROM constructors").fetchall()]
+    finally:
+        cur.close()
+    def alternation(names):
+        names = sorted({n for n in names if n}, key=len, reverse=True)  # longest first
+        rx = re.compile(r"(?<!\w)(" + "|".join(map(re.escape, names)) + r")(?!\w)", re.I)
+        return rx, {n.lower(): n for n in names}
+    return (("DRIVER",) + alternation(drivers), ("TEAM",) + alternation(teams))
+
+def _extract_slots(q: str):
+    """'Max Verstappen wins 2023' -> ('{DRIVER} wins {YEAR}', ['Max Verstappen', 2023])"""
+    spans = []
+    for kind, rx, canon in _entity_res():
+        spans += [(m.start(), m.end(), kind, canon[m.group(0).lower()]) for m in rx.finditer(q)]
+    spans += [(m.start(), m.end(), "YEAR", int(m.group(0))) for m in _YEAR_SLOT.finditer(q)]
+    spans.sort(key=lambda s: (s[0], s[0] - s[1]))  # leftmost, then longest
+    parts, slots, pos = [], [], 0
+    for a, b, kind, val in spans:
+        if a < pos:  # overlaps a slot already taken (e.g. a team inside a driver name)
+            continue
+        parts += [q[pos:a].lower(), "{" + kind + "}"]
+        slots.append(val)
+        pos = b
+    parts.append(q[pos:].lower())
+    return _WS.sub(" ", "".join(parts).strip()), slots
+
+# quoted SQL strings/identifiers, matched whole so nothing inside them is touched
+_SQL_QUOTED = r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\""
+_RE_PLACEHOLDER = re.compile(_SQL_QUOTED + r"|\?")
+
+def _literal(v) -> str:
+    return str(v) if isinstance(v, int) else "'" + v.replace("'", "''") + "'"
+
+def _parameterize(sql: str, slots: list):
+    """Swap each slot's literal in `sql` for ?; None if a slot is unused or ambiguous."""
+    lits = {}
+    for i, v in enumerate(slots):
+        lits.setdefault(_literal(v), i)
+    if len(lits) != len(slots):
+        return None  # repeated value: can't tell which ? belongs to which slot
+    if not lits:
+        return sql, []
+    nums = sorted((l for l in lits if not l.startswith("'")), key=len, reverse=True)
+    rx = re.compile("|".join([_SQL_QUOTED] + [r"(?<![\w.%-])" + re.escape(l) + r"(?![\w.%-])" for l in nums]))
+    order = []
+    def sub(m):
+        tok = m.group(0)
+        if tok not in lits:
+            return tok  # another quoted string: a year inside it is not a slot
+        order.append(lits[tok])
+        return "?"
+    out = rx.sub(sub, sql)
+    return (out, order) if set(order) == set(lits.values()) else None
+
+def _bind(sql: str, params: list) -> str:
+    """`sql` with each ? (outside quotes) replaced by its param as a literal, for display."""
+    it = iter(params)
+    return _RE_PLACEHOLDER.sub(lambda m: _literal(next(it)) if m.group(0) == "?" else m.group(0), sql)
+
+def _remember(template: str, slots: list, sql: str):
+    p = _parameterize(sql, slots)
+    if p is not None:
+        if len(_TEMPLATES) >= _TEMPLATE_MAX:
+            _TEMPLATES.pop(next(iter(_TEMPLATES)))  # drop the oldest template
+        _TEMPLATES[template] = p
+
+# -------------------- Known intents (no LLM) --------------------
+# Common shapes answered straight from the mv_* rollups; everything else goes to the LLM.
+_Y = r"(?P<year>(?:19|20)\d{2})"
+_INTENTS = [
+    (re.compile(rf"^(?:how many )?wins? (?:for|by) (?P<driver>.+?) in {_Y}\??$", re.I),
+     "SELECT COALESCE(MAX(wins), 0) AS wins FROM mv_driver_year_wins WHERE name = ? AND year = ?"),
+    (re.compile(rf"^(?:how many )?points (?:for|by) (?P<driver>.+?) in {_Y}\??$", re.I),
+     "SELECT COALESCE(MAX(points), 0) AS total_points FROM mv_driver_year_points WHERE name = ? AND year = ?"),
+    (re.compile(rf"^(?:how many )?podiums (?:for|by) (?P<driver>.+?) in {_Y}\??$", re.I),
+     "SELECT COALESCE(MAX(podiums), 0) AS podiums FROM mv_driver_year_podiums WHERE name = ? AND year = ?"),
+    (re.compile(rf"^(?P<driver>.+?) podiums by season since {_Y}\??$", re.I),
+     "SELECT year, name, podiums FROM mv_driver_year_podiums WHERE name = ? AND year >= ? ORDER BY year"),
+    (re.compile(rf"^(?P<team>.+?) points by race in {_Y}\??$", re.I),
+     "SELECT year, round, race_name, constructor, points FROM mv_constructor_race_points "
+     "WHERE constructor = ? AND year = ? ORDER BY round"),
+] if _HAS_ROLLUPS else []
+
+def _canonical(kind: str, text: str):
+    for k, _, canon in _entity_res():
+        if k == kind:
+            return canon.get(text.strip().lower())
+    return None
+
+def _intent_sql(question: str):
+    """(sql, params) when `question` is a known shape naming a known driver/team, else None."""
+    q = _WS.sub(" ", question.strip())
+    for rx, sql in _INTENTS:
+        m = rx.match(q)
+        if not m:
+            continue
+        g = m.groupdict()
+        name = _canonical("DRIVER", g["driver"]) if "driver" in g else _canonical("TEAM", g["team"])
+        if name is None:
+            continue  # unknown spelling: let the LLM handle it
+        return sql, [name, int(g["year"])]
+    return None
+
+def _plan(question: str):
+    """(sql, params, key): sql is None when the LLM must write it; key = (template, slots) to remember."""
+    hit = _intent_sql(question)
+    if hit is not None:
+        return hit[0], hit[1], None
+    template, slots = _extract_slots(question)
+    cached = _TEMPLATES.get(template)
+    if cached is not None:
+        sql, order = cached
+        return sql, [slots[i] for i in order], None
+    return None, [], (template, slots)
+
 def answer(question: str, max_rows: int = 200):
-    sql = llm_to_sql(question)
+    sql, params, key = _plan(question)
+    if sql is None:
+        sql = llm_to_sql(question)
+        _remember(*key, sql)
+    return _run(sql, params, max_rows)
+
+def answer_batch(questions: list, max_rows: int = 200) -> list:
+    """answer() for several questions; LLM misses share one llm_to_sql_batch call."""
+    plans = [_plan(q) for q in questions]
+    misses = [i for i, (sql, _, _) in enumerate(plans) if sql is None]
+    for i, sql in zip(misses, llm_to_sql_batch([questions[i] for i in misses])):
+        _remember(*plans[i][2], sql)
+        plans[i] = (sql, [], None)
+    return [_run(sql, params, max_rows) for sql, params, _ in plans]
+
+def answer_many(questions: list, max_rows: int = 200) -> list:
+    """answer() for several questions with the LLM calls issued concurrently (asyncio.gather)."""
+    return asyncio.run(_answer_many(list(questions), max_rows))
+
+async def _answer_many(questions: list, max_rows: int) -> list:
+    sem = asyncio.Semaphore(LLM_CONCURRENCY)
+    async def one(question):
+        sql, params, key = _plan(question)
+        if sql is None:
+            async with sem:
+                sql = await llm_to_sql_async(question)
+            _remember(*key, sql)
+        return _run(sql, params, max_rows)
+    return await asyncio.gather(*(one(q) for q in questions))
 
+def _run(sql: str, params: list, max_rows: int):
     # Append LIMIT only when:
     # - there is no LIMIT already
     # - and there is NO aggregation (count/sum/avg/min/max) AND NO GROUP BY
     #   (i.e., a potentially huge raw row set)
     needs_limit = (
-        re.search(r"\blimit\b", sql, re.I) is None
-        and re.search(r"\b(count|sum|avg|min|max)\s*\(", sql, re.I) is None
-        and re.search(r"\bgroup\s+by\b", sql, re.I) is None
+        _RE_LIMIT.search(sql) is None
+        and _RE_AGG.search(sql) is None
+        and _RE_GB.search(sql) is None
     )
     if needs_limit:
         sql += f"\nLIMIT {max_rows}"
 
-    con = duckdb.connect("f1.duckdb")
-    data = con.execute(sql).fetchall()
-    cols = [d[0] for d in con.description]
-    return sql, cols, data
+    cur = _con().cursor()  # cursors are cheap and safe to use from separate threads
+    try:
+        # columnar pyarrow.Table, no per-cell Python objects; call .to_pylist() at the boundary if needed
+        data = cur.execute(sql, params).arrow()
+    finally:
+        cur.close()
+    return _bind(sql, params), data.column_names, data
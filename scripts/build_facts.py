@@ -1,31 +1,147 @@
 # scripts/build_facts.py
+import csv, json, os
 import duckdb
 from pathlib import Path
 
 DATA_DIR = Path("data")
+SCHEMA_PATH = Path("artifacts/schema.json")  # column types from the last build (scripts/dump_schema.py)
+
+# One row per (driver, year) with zero counts kept, so lookups never miss a driver who raced.
+_DRIVER_YEAR = """
+    SELECT rs.driverId, d.name, r.year, {agg}
+    FROM results rs
+    JOIN races r ON r.raceId = rs.raceId
+    JOIN drivers d ON d.driverId = rs.driverId
+    GROUP BY 1, 2, 3
+"""
+
+ROLLUPS = {
+    "mv_driver_year_wins": _DRIVER_YEAR.format(
+        agg="COUNT(*) FILTER (WHERE rs.positionText = '1') AS wins"),
+    "mv_driver_year_points": _DRIVER_YEAR.format(
+        agg="COALESCE(SUM(rs.points), 0) AS points"),
+    "mv_driver_year_podiums": _DRIVER_YEAR.format(
+        agg="COUNT(*) FILTER (WHERE try_cast(rs.positionText AS INTEGER) BETWEEN 1 AND 3) AS podiums"),
+    "mv_constructor_race_points": """
+        SELECT rs.constructorId, c.name AS constructor, r.year, r.round,
+               r.raceId, r.name AS race_name, SUM(rs.points) AS points
+        FROM results rs
+        JOIN races r ON r.raceId = rs.raceId
+        JOIN constructors c ON c.constructorId = rs.constructorId
+        GROUP BY 1, 2, 3, 4, 5, 6
+    """,
+}
+# Index on what lookups filter by (MV_SHOTS and the intents in backend/sql_agent.py use names)
+ROLLUP_KEYS = {
+    "mv_driver_year_wins": "name, year",
+    "mv_driver_year_points": "name, year",
+    "mv_driver_year_podiums": "name, year",
+    "mv_constructor_race_points": "constructor, year",
+}
+# Source tables each rollup reads; a rollup is rebuilt only when one of these was re-ingested.
+ROLLUP_DEPS = {
+    "mv_driver_year_wins": {"results", "races", "drivers"},
+    "mv_driver_year_points": {"results", "races", "drivers"},
+    "mv_driver_year_podiums": {"results", "races", "drivers"},
+    "mv_constructor_race_points": {"results", "races", "constructors"},
+}
+
+# Physical row order for the big fact tables: raceIds come in per-season blocks, so sorting
+# by raceId clusters each season and zone maps let year-filtered joins skip most row groups.
+SORT_KEYS = {
+    "results": "raceId, driverId",
+    "sprint_results": "raceId, driverId",
+    "qualifying": "raceId, driverId",
+    "lap_times": "raceId, driverId, lap",
+    "pit_stops": "raceId, driverId, stop",
+}
+
+# ART indexes on the columns generated SQL filters on most
+HOT_INDEXES = {
+    "idx_drivers_name": "drivers(name)",
+    "idx_races_year": "races(year)",
+    "idx_results_pos": "results(positionText)",
+    "idx_constructors_name": "constructors(name)",
+}
 
 def main():
     if not DATA_DIR.exists():
         raise SystemExit("data/ folder not found. Create it and put CSVs inside.")
 
     con = duckdb.connect("f1.duckdb")
-    con.execute("PRAGMA threads=4;")
+    con.execute(f"PRAGMA threads={os.cpu_count() or 4};")
+    con.execute("PRAGMA memory_limit='4GB';")
+
+    known = json.loads(SCHEMA_PATH.read_text()) if SCHEMA_PATH.exists() else {}
+    try:
+        _build(con, known)
+    except duckdb.Error as e:
+        if not known:
+            raise
+        # a CSV no longer fits the recorded types: start over and let DuckDB sniff them
+        con.execute("ROLLBACK")
+        print(f"Typed load failed ({e}); retrying with read_csv_auto")
+        _build(con, {})
+
+    con.close()
+    print("✅ Built f1.duckdb")
+
+def _csv_source(p, known):
+    """read_csv call for p: explicit types from schema.json when its header still matches."""
+    with open(p, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    cols = known.get(p.stem.lower(), [])[:len(header)]  # ignore columns added after load (drivers.name)
+    if cols and header == [c["name"] for c in cols]:
+        types = ", ".join(f"'{c['name']}': '{c['type']}'" for c in cols)
+        return f"read_csv('{p.as_posix()}', header=True, auto_detect=False, columns={{{types}}})"
+    return f"read_csv_auto('{p.as_posix()}', header=True)"
+
+def _build(con, known):
+    # one transaction for the whole build: a single commit instead of one per table
+    con.execute("BEGIN TRANSACTION;")
+
+    # (mtime, size) of each CSV as last ingested; unchanged files are skipped
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS _ingest_meta(
+            table_name VARCHAR PRIMARY KEY, mtime DOUBLE, size BIGINT);
+    """)
+    seen = {t: (m, n) for t, m, n in con.execute("SELECT * FROM _ingest_meta").fetchall()}
+    existing = {r[0] for r in con.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'").fetchall()}
+    changed = set()
 
     # Ingest every .csv in data/, table name = filename (lowercase, no extension)
     for p in sorted(DATA_DIR.glob("*.csv")):
         table = p.stem.lower()  # e.g., results.csv -> results
+        st = p.stat()
+        if table in existing and seen.get(table) == (st.st_mtime, st.st_size):
+            print(f"Skipping {p.name} (unchanged)")
+            continue
         print(f"Ingesting {p.name} -> table {table}")
+        order = f" ORDER BY {SORT_KEYS[table]}" if table in SORT_KEYS else ""
         con.execute(f"""
             CREATE OR REPLACE TABLE {table} AS
-            SELECT * FROM read_csv_auto('{p.as_posix()}', header=True);
+            SELECT * FROM {_csv_source(p, known)}{order};
         """)
         n = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
         print(f"  rows: {n}")
+        con.execute("INSERT OR REPLACE INTO _ingest_meta VALUES (?, ?, ?)", [table, st.st_mtime, st.st_size])
+        changed.add(table)
+
+    # Stored full name, so name lookups hit an index instead of concatenating every row
+    if "drivers" in changed:
+        con.execute("""
+            CREATE OR REPLACE TABLE drivers AS
+            SELECT *, (forename || ' ' || surname) AS name FROM drivers;
+        """)
+    for idx, target in HOT_INDEXES.items():
+        con.execute(f"CREATE INDEX IF NOT EXISTS {idx} ON {target};")
+    print(f"Created indexes: {', '.join(HOT_INDEXES)}")
 
     # Helpful views for simple name joins
     con.execute("""
         CREATE OR REPLACE VIEW driver_name AS
-        SELECT driverId, (forename || ' ' || surname) AS name FROM drivers;
+        SELECT driverId, name FROM drivers;
     """)
     con.execute("""
         CREATE OR REPLACE VIEW constructor_name AS
@@ -33,8 +149,20 @@ def main():
     """)
     print("Created views: driver_name, constructor_name")
 
-    con.close()
-    print("✅ Built f1.duckdb")
+    # Rollups for the hot question shapes (see FEW_SHOTS in backend/sql_agent.py).
+    # Historical data doesn't change between builds, so these are plain tables.
+    for table, sql in ROLLUPS.items():
+        if table in existing and not ROLLUP_DEPS[table] & changed:
+            print(f"Rollup {table}: up to date")
+        else:
+            con.execute(f"CREATE OR REPLACE TABLE {table} AS {sql}")
+            n = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            print(f"Rollup {table}: {n} rows")
+        # recreated every build (small tables), so a skipped rollup still picks up new ROLLUP_KEYS
+        con.execute(f"DROP INDEX IF EXISTS idx_{table}")
+        con.execute(f"CREATE INDEX idx_{table} ON {table}({ROLLUP_KEYS[table]})")
+
+    con.execute("COMMIT;")
 
 if __name__ == "__main__":
     main()
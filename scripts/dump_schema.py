@@ -1,17 +1,23 @@
 # scripts/dump_schema.py
-import duckdb, json, os
+import duckdb, json, os, pprint
 os.makedirs("artifacts", exist_ok=True)
 
 con = duckdb.connect("f1.duckdb")
-tables = [r[0] for r in con.execute("""
-  SELECT table_name FROM information_schema.tables
-  WHERE table_schema='main' ORDER BY 1
-""").fetchall()]
+rows = con.execute("""
+  SELECT table_name, column_name, data_type FROM information_schema.columns
+  WHERE table_schema='main' AND table_name <> '_ingest_meta'  -- build bookkeeping, not for prompts
+  ORDER BY table_name, ordinal_position
+""").fetchall()
 
 schema = {}
-for t in tables:
-    cols = con.execute(f"PRAGMA table_info('{t}')").fetchall()
-    schema[t] = [{"name": c[1], "type": c[2]} for c in cols]
+for t, c, ty in rows:
+    schema.setdefault(t, []).append({"name": c, "type": ty})
 
 with open("artifacts/schema.json","w") as f: json.dump(schema, f, indent=2)
 print("Wrote artifacts/schema.json")
+
+# Same dict as an importable module, so backend/sql_agent.py gets it from a cached .pyc
+with open("artifacts/schema.py","w") as f:
+    f.write("# Generated by scripts/dump_schema.py; do not edit.\n")
+    f.write(f"SCHEMA = {pprint.pformat(schema, sort_dicts=False)}\n")
+print("Wrote artifacts/schema.py")
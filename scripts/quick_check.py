@@ -3,12 +3,15 @@ import os, duckdb
 print("CWD:", os.getcwd())
 print("DB exists:", os.path.exists("f1.duckdb"))
 
-con = duckdb.connect("f1.duckdb")
+con = duckdb.connect("f1.duckdb", read_only=True)  # one connection for every check below
 
-# quick table counts
-print("results rows:",  con.execute("SELECT COUNT(*) FROM results").fetchone()[0])
-print("races rows:",    con.execute("SELECT COUNT(*) FROM races").fetchone()[0])
-print("drivers rows:",  con.execute("SELECT COUNT(*) FROM drivers").fetchone()[0])
+# quick table counts (one round trip)
+results_n, races_n, drivers_n = con.execute("""
+  SELECT (SELECT COUNT(*) FROM results), (SELECT COUNT(*) FROM races), (SELECT COUNT(*) FROM drivers)
+""").fetchone()
+print("results rows:",  results_n)
+print("races rows:",    races_n)
+print("drivers rows:",  drivers_n)
 
 driver, year = "Max Verstappen", 2023
 wins = con.execute("""
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")  # the shared client is built at import
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("google.genai")
+
+from google.genai import errors
+
+from backend import gemini
+
+class _FakeModels:
+    """generate_content that raises each queued error in turn, then returns "ok"."""
+
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return "ok"
+
+    def generate_content_stream(self, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return iter(["o", "k"])
+
+class _FakeClient:
+    def __init__(self, models):
+        self.models = models
+
+@pytest.fixture
+def fake(monkeypatch):
+    def install(*failures):
+        models = _FakeModels(*failures)
+        monkeypatch.setattr(gemini, "client", _FakeClient(models))
+        monkeypatch.setattr(gemini.time, "sleep", lambda s: None)
+        return models
+    return install
+
+def _server_error(code):
+    return errors.ServerError(code, {"error": {"code": code, "message": "unavailable", "status": "UNAVAILABLE"}})
+
+def test_retries_503_then_succeeds(fake):
+    models = fake(_server_error(503))
+    assert gemini.generate(model="m", contents="q") == "ok"
+    assert models.calls == 2
+
+def test_retries_connection_error_then_succeeds(fake):
+    models = fake(httpx.ConnectError("connection reset"), httpx.ReadTimeout("stalled"))
+    assert gemini.generate(model="m", contents="q") == "ok"
+    assert models.calls == 3
+
+def test_gives_up_after_retries(fake):
+    models = fake(*[_server_error(503)] * gemini.RETRIES)
+    with pytest.raises(errors.ServerError):
+        gemini.generate(model="m", contents="q")
+    assert models.calls == gemini.RETRIES
+
+def test_does_not_retry_client_errors(fake):
+    models = fake(errors.ClientError(400, {"error": {"code": 400, "message": "bad request", "status": "INVALID_ARGUMENT"}}))
+    with pytest.raises(errors.ClientError):
+        gemini.generate(model="m", contents="q")
+    assert models.calls == 1
+
+def test_stream_retries_before_first_chunk(fake):
+    models = fake(_server_error(503), httpx.ConnectError("connection reset"))
+    assert list(gemini.stream(model="m", contents="q")) == ["o", "k"]
+    assert models.calls == 3
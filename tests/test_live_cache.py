@@ -0,0 +1,44 @@
+import re
+
+import numpy as np
+
+from backend.live_cache import SemanticCache, entity_key
+
+YEAR = re.compile(r"(19|20)\d{2}")
+DRIVER = re.compile(r"(?<!\w)(?:verstappen|hamilton)(?!\w)", re.I)
+
+def _unit(*xs):
+    v = np.array(xs, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+# two embeddings with cosine ~0.999, i.e. well over any sensible threshold
+VEC = _unit(1.0, 0.0, 0.0)
+NEAR = _unit(1.0, 0.04, 0.0)
+
+def _key(q):
+    return entity_key(q, YEAR, DRIVER)
+
+def test_entity_key():
+    assert _key("Who won the 2023 title, Verstappen?") == {"2023", "verstappen"}
+    assert _key("latest F1 news") == frozenset()
+
+def test_different_year_is_a_miss():
+    cache = SemanticCache(min_sim=0.95, max_items=8)
+    cache.put("who won the 2023 championship", _key("who won the 2023 championship"), VEC, "2023 answer")
+    assert cache.get(_key("who won the 2022 championship"), NEAR) is None
+    assert cache.get(_key("Who won the 2023 championship?"), NEAR) == "2023 answer"
+
+def test_different_driver_is_a_miss():
+    cache = SemanticCache(min_sim=0.95, max_items=8)
+    cache.put("latest news on Verstappen", _key("latest news on Verstappen"), VEC, "Verstappen news")
+    assert cache.get(_key("latest news on Hamilton"), NEAR) is None
+    assert cache.get(_key("latest news on verstappen"), NEAR) == "Verstappen news"
+
+def test_similarity_threshold_and_lru():
+    cache = SemanticCache(min_sim=0.95, max_items=2)
+    cache.put("a", frozenset(), VEC, "A")
+    assert cache.get(frozenset(), _unit(0.0, 1.0, 0.0)) is None  # same entities, unrelated question
+    cache.put("b", frozenset({"2021"}), VEC, "B")
+    cache.put("c", frozenset({"2020"}), VEC, "C")  # evicts "a"
+    assert cache.get(frozenset(), VEC) is None
+    assert cache.get(frozenset({"2021"}), VEC) == "B"